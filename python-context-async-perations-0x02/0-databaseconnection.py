@@ -1,4 +1,26 @@
 import sqlite3
+from db_pool import get_pool
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+class BulkCursor(sqlite3.Cursor):
+    def bulk_insert(self, table, columns, rows):
+        # executemany inside the block's transaction: every row shares the
+        # single commit (and fsync) made when the block exits
+        placeholders = ", ".join("?" for _ in columns)
+        query = (f"INSERT INTO {quote_identifier(table)} "
+                 f"({', '.join(quote_identifier(column) for column in columns)}) "
+                 f"VALUES ({placeholders})")
+        self.executemany(query, rows)
+        return self.rowcount
+
+def finish_transaction(conn, exc_type):
+    # One transaction per block: commit when it succeeds, roll back when it raises
+    if exc_type is None:
+        conn.commit()
+    else:
+        conn.rollback()
 
 class DatabaseConnection:
     def __init__(self):
@@ -7,14 +29,40 @@ class DatabaseConnection:
         
     def __enter__(self):
         self.conn = sqlite3.connect("users.db")
-        self.cursor = self.conn.cursor()
+        self.cursor = self.conn.cursor(BulkCursor)
+        return self.cursor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            finish_transaction(self.conn, exc_type)
+        finally:
+            self.conn.close()
+
+class PooledDatabaseConnection:
+    def __init__(self, database="users.db", timeout=None):
+        self.pool = get_pool(database)
+        self.timeout = timeout
+        self.conn = None
+        self.cursor = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire(self.timeout)
+        self.cursor = self.conn.cursor(BulkCursor)
         return self.cursor
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.conn.close()
+        try:
+            finish_transaction(self.conn, exc_type)
+        finally:
+            self.cursor.close()
+            self.pool.release(self.conn)
+            self.conn = None
+
+def main():
+    with DatabaseConnection() as cursor:
+        cursor.execute("SELECT * FROM users")
+        results = cursor.fetchall()
+        print(results)
 
-# Usage
-with DatabaseConnection() as cursor:
-    cursor.execute("SELECT * FROM users")
-    results = cursor.fetchall()
-    print(results)
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,92 @@
 import sqlite3
+import threading
+from db_pool import get_pool
 
 class ExecuteQuery:
-    def __init__(self, query, params=()):
+    def __init__(self, query, params=(), stream=False, chunk_size=1000):
         self.query = query
         self.params = params
+        self.stream = stream
+        self.chunk_size = chunk_size
 
     def __enter__(self):
         self.conn = sqlite3.connect("users.db")
         self.cursor = self.conn.cursor()
         self.cursor.execute(self.query, self.params)
+        if self.stream:
+            return self.iter_rows()
         return self.cursor.fetchall()
 
+    def iter_rows(self):
+        # Rows are pulled chunk_size at a time while the block runs; the
+        # connection stays open until the block exits
+        while True:
+            rows = self.cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            yield from rows
+
     def __exit__(self, exc_type, exc_value, traceback):
+        self.cursor.close()
         self.conn.close()
 
-# Usage
-query = "SELECT * FROM users WHERE age > ?"
-params = (25,)
+class PreparedQuery:
+    # A query bound once to a database's pool. Each execute() borrows a
+    # connection, and sqlite3 reuses the statement already compiled in that
+    # connection's cache (sized by cached_statements), so after warm-up the
+    # SQL is compiled once per pooled connection rather than once per call.
+    def __init__(self, query, database="users.db", cached_statements=None):
+        self.query = query
+        options = {} if cached_statements is None else {'cached_statements': cached_statements}
+        self.pool = get_pool(database, **options)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, conn):
+        hit = self.pool.note_statement(conn, self.query)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def execute(self, params=(), timeout=None):
+        conn = self.pool.acquire(timeout)
+        try:
+            self._record(conn)
+            return conn.execute(self.query, params).fetchall()
+        finally:
+            self.pool.release(conn)
+
+    def stream(self, params=(), chunk_size=1000, timeout=None):
+        # The borrowed connection is held only while the stream is iterated
+        conn = self.pool.acquire(timeout)
+        try:
+            self._record(conn)
+            cursor = conn.execute(self.query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+        finally:
+            self.pool.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {'query': self.query, 'hits': self.hits, 'misses': self.misses,
+                    'cached_statements': self.pool.cached_statements}
+
+def main():
+    query = "SELECT * FROM users WHERE age > ?"
+    params = (25,)
+
+    with ExecuteQuery(query, params) as results:
+        print(results)
 
-with ExecuteQuery(query, params) as results:
-    print(results)
+if __name__ == "__main__":
+    main()
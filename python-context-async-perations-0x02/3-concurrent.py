@@ -1,5 +1,6 @@
 import aiosqlite
 import asyncio
+from async_db import AsyncDatabase
 
 async def async_fetch_users():
     async with aiosqlite.connect("users.db") as db:
@@ -11,13 +12,29 @@ async def async_fetch_older_users():
         async with db.execute("SELECT * FROM users WHERE age > 40") as cursor:
             return await cursor.fetchall()
 
+# The same queries on an open AsyncDatabase, sharing its reader pool
+async def fetch_users(db):
+    return await db.fetchall("SELECT * FROM users")
+
+async def fetch_older_users(db):
+    return await db.fetchall("SELECT * FROM users WHERE age > ?", (40,))
+
+async def fetch_in_one_scan(db):
+    # Both result sets from a single pass over users
+    results = await db.scan_partitioned("users", {"all": None, "older": ("age", ">", 40)})
+    return results["all"], results["older"]
+
 async def fetch_concurrently():
-    all_users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    async with AsyncDatabase("users.db", readers=2) as db:
+        all_users, older_users = await asyncio.gather(
+            fetch_users(db),
+            fetch_older_users(db)
+        )
     print("All Users:", all_users)
     print("Older Users (age > 40):", older_users)
 
-# Run async
-asyncio.run(fetch_concurrently())
+def main():
+    asyncio.run(fetch_concurrently())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import asyncio
+import operator
+import sqlite3
+from contextlib import suppress
+
+import aiosqlite
+
+_STOP = object()
+_END = object()
+
+PREDICATE_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class AsyncDatabase:
+    # A fixed pool of read-only connections plus one writer fed by a queue.
+    # In WAL mode readers do not block each other or the writer, so reads
+    # issued with asyncio.gather really run side by side.
+    def __init__(self, database="users.db", readers=4, max_pending_writes=1000, coalesce=True,
+                 batch_window_ms=2, max_batch=500):
+        self.database = database
+        self.reader_count = readers
+        self.max_pending_writes = max_pending_writes
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.coalesce = coalesce
+        self._in_flight = {}
+        self._generation = 0
+        self.coalesced = 0
+        self._readers = None
+        self._writer = None
+        self._writes = None
+        self._writer_task = None
+        self._closing = False
+
+    async def open(self):
+        # Autocommit mode: the write loop issues BEGIN/COMMIT itself
+        self._writer = await aiosqlite.connect(self.database, isolation_level=None)
+        await self._writer.execute("PRAGMA journal_mode=WAL")
+        await self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._readers = asyncio.Queue()
+        for _ in range(self.reader_count):
+            reader = await aiosqlite.connect(self.database)
+            await reader.execute("PRAGMA query_only=ON")
+            self._readers.put_nowait(reader)
+        self._writes = asyncio.Queue(maxsize=self.max_pending_writes)
+        self._closing = False
+        self._writer_task = asyncio.ensure_future(self._write_loop())
+        return self
+
+    async def fetchall(self, sql, params=()):
+        # Single flight: callers asking for the same (sql, params) while a
+        # read is running share it instead of starting another scan. The key
+        # includes the write generation, so a read issued after a commit never
+        # joins one that started before it.
+        if not self.coalesce:
+            return await self._fetchall(sql, params)
+        key = (sql, tuple(params), self._generation)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetchall(sql, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller being cancelled does not cancel the others
+        return list(await asyncio.shield(task))
+
+    async def scan_partitioned(self, table, predicates):
+        # Serves several filters over one table with a single scan. predicates
+        # maps a name to (column, operator, value), or None for every row;
+        # rows are split into one list per name on the client.
+        clauses = []
+        params = []
+        for predicate in predicates.values():
+            if predicate is None:
+                clauses = []
+                break
+            column, op, value = predicate
+            if op not in PREDICATE_OPERATORS:
+                raise ValueError(f"Unsupported operator: {op}")
+            clauses.append(f"{quote_identifier(column)} {op} ?")
+            params.append(value)
+        sql = f"SELECT * FROM {quote_identifier(table)}"
+        if clauses:
+            sql += " WHERE " + " OR ".join(clauses)
+        reader = await self._readers.get()
+        try:
+            async with reader.execute(sql, params) as cursor:
+                columns = [column[0] for column in cursor.description]
+                rows = await cursor.fetchall()
+        finally:
+            self._readers.put_nowait(reader)
+
+        results = {}
+        for name, predicate in predicates.items():
+            if predicate is None:
+                results[name] = list(rows)
+                continue
+            column, op, value = predicate
+            index = columns.index(column)
+            compare = PREDICATE_OPERATORS[op]
+            results[name] = [row for row in rows if row[index] is not None and compare(row[index], value)]
+        return results
+
+    async def _fetchall(self, sql, params=()):
+        reader = await self._readers.get()
+        try:
+            async with reader.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def fetchone(self, sql, params=()):
+        reader = await self._readers.get()
+        try:
+            async with reader.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def stream(self, sql, params=(), chunk_size=500, max_chunks=4):
+        # async for over the rows of a query. A producer task holds one reader
+        # and fetches chunk_size rows at a time into a queue of at most
+        # max_chunks, so memory stays bounded and the first rows arrive before
+        # the scan finishes. Leaving the loop early or cancelling the consumer
+        # stops the producer and returns the reader to the pool.
+        chunks = asyncio.Queue(maxsize=max_chunks)
+        producer = asyncio.ensure_future(self._produce(chunks, sql, params, chunk_size))
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is _END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                for row in chunk:
+                    yield row
+        finally:
+            if not producer.done():
+                producer.cancel()
+                with suppress(asyncio.CancelledError):
+                    await producer
+
+    async def _produce(self, chunks, sql, params, chunk_size):
+        reader = await self._readers.get()
+        try:
+            async with reader.execute(sql, params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    await chunks.put(rows)
+            await chunks.put(_END)
+        except Exception as err:
+            await chunks.put(err)
+        finally:
+            self._readers.put_nowait(reader)
+
+    def _check_writer(self):
+        if self._writer_task is None or self._writer_task.done() or self._closing:
+            raise sqlite3.ProgrammingError("The write batcher is closed")
+
+    async def submit(self, sql, params=()):
+        # Resolves with (rowcount, lastrowid) once the batch holding this
+        # write is committed, or raises the error this statement hit
+        self._check_writer()
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((sql, params, future))
+        if self._writer_task.done():
+            # The writer stopped while we waited for queue space
+            self._fail_queued()
+        return await future
+
+    execute = submit
+
+    def _fail_queued(self):
+        while not self._writes.empty():
+            item = self._writes.get_nowait()
+            if item is not _STOP and not item[2].done():
+                item[2].set_exception(sqlite3.ProgrammingError("The write batcher is closed"))
+
+    async def _write_loop(self):
+        # Group commit: take whatever is queued, wait up to batch_window for
+        # more, and commit at most max_batch statements in one transaction
+        loop = asyncio.get_running_loop()
+        stopping = False
+        batch = []
+        try:
+            while not stopping:
+                item = await self._writes.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = loop.time() + self.batch_window
+                while len(batch) < self.max_batch:
+                    if self._writes.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(self._writes.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        item = self._writes.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                await self._commit_batch(batch)
+        finally:
+            # Whether stopped, cancelled or crashed, nobody may be left waiting
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(sqlite3.ProgrammingError("The write batcher stopped"))
+            self._fail_queued()
+
+    async def _run_write(self, sql, params=()):
+        async with self._writer.execute(sql, params) as cursor:
+            return cursor.rowcount, cursor.lastrowid
+
+    async def _commit_batch(self, batch):
+        # SQLite backs out just the failing statement on an ordinary error, so
+        # that write is reported alone while the rest of the batch commits. An
+        # error that ends the whole transaction fails the batch.
+        outcomes = []
+        try:
+            await self._run_write("BEGIN IMMEDIATE")
+            for sql, params, future in batch:
+                try:
+                    outcomes.append((future, await self._run_write(sql, params), None))
+                except Exception as err:
+                    if not self._writer.in_transaction:
+                        raise
+                    outcomes.append((future, None, err))
+            await self._run_write("COMMIT")
+            self._generation += 1
+        except Exception as err:
+            if self._writer.in_transaction:
+                with suppress(Exception):
+                    await self._run_write("ROLLBACK")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for future, result, err in outcomes:
+            if future.done():
+                continue
+            if err is None:
+                future.set_result(result)
+            else:
+                future.set_exception(err)
+
+    async def close(self):
+        if self._writer_task is not None:
+            # Writes already queued are committed; later submits are refused
+            self._closing = True
+            if not self._writer_task.done():
+                await self._writes.put(_STOP)
+            # wait() does not re-raise a crashed or cancelled writer's error
+            await asyncio.wait([self._writer_task])
+            if not self._writer_task.cancelled():
+                self._writer_task.exception()
+            self._writer_task = None
+        if self._readers is not None:
+            while not self._readers.empty():
+                await self._readers.get_nowait().close()
+            self._readers = None
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
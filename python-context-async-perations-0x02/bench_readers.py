@@ -0,0 +1,23 @@
+import asyncio
+import sys
+import time
+
+from async_db import AsyncDatabase
+
+QUERY = "SELECT * FROM users WHERE age > ?"
+
+async def run(readers, queries):
+    # Coalescing off: every query must really go through the reader pool
+    async with AsyncDatabase("users.db", readers=readers, coalesce=False) as db:
+        started = time.perf_counter()
+        await asyncio.gather(*(db.fetchall(QUERY, (index % 100,)) for index in range(queries)))
+        return time.perf_counter() - started
+
+async def main(sizes, queries=2000):
+    print(f"{'readers':>8} {'seconds':>9} {'queries/sec':>12}")
+    for readers in sizes:
+        elapsed = await run(readers, queries)
+        print(f"{readers:>8} {elapsed:>9.2f} {queries / elapsed:>12.0f}")
+
+if __name__ == '__main__':
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8]))
@@ -0,0 +1,21 @@
+import importlib
+import sys
+
+# Command line entry point for the example queries. The numbered modules only
+# define functions, so importing them (here or from a worker) touches no database.
+COMMANDS = {
+    'connection': '0-databaseconnection',
+    'execute': '1-execute',
+    'concurrent': '3-concurrent',
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1 or argv[0] not in COMMANDS:
+        print(f"Usage: python3 cli.py {{{'|'.join(COMMANDS)}}}")
+        return 2
+    importlib.import_module(COMMANDS[argv[0]]).main()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+class ConnectionPool:
+    # Keeps up to max_size warm connections for one database file. Pragmas
+    # are applied once, when a connection is first opened.
+    def __init__(self, database, max_size=5, mmap_size=256 * 1024 * 1024, cache_kib=64 * 1024,
+                 cached_statements=128):
+        self.database = database
+        self.max_size = max_size
+        self.cached_statements = cached_statements
+        self.mmap_size = mmap_size
+        self.cache_kib = cache_kib
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._statements = {}
+
+    def _open(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_kib)}")
+        return conn
+
+    def note_statement(self, conn, sql):
+        # Mirrors sqlite3's per-connection LRU statement cache for the SQL
+        # run through it (PreparedQuery); True means sql is still compiled
+        # on conn. Statements run on conn by other code are not seen.
+        with self._lock:
+            seen = self._statements.setdefault(id(conn), OrderedDict())
+            hit = sql in seen
+            seen[sql] = None
+            seen.move_to_end(sql)
+            if len(seen) > self.cached_statements:
+                seen.popitem(last=False)
+        return hit
+
+    def _open_slot(self):
+        # Opens a connection for a slot already counted in _opened
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def acquire(self, timeout=None):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                open_new = self._opened < self.max_size
+                if open_new:
+                    self._opened += 1
+            if open_new:
+                return self._open_slot()
+            try:
+                conn = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No connection to {self.database} available after {timeout}s")
+        if conn is None:
+            # The slot of a discarded connection, handed over by release()
+            return self._open_slot()
+        return conn
+
+    def release(self, conn):
+        # Undo anything the block left behind so the next user gets a clean
+        # connection; a connection that cannot be reset is thrown away and
+        # its slot queued as None, so a waiting acquire() opens a new one
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._statements.pop(id(conn), None)
+            self._idle.put(None)
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+            with self._lock:
+                self._opened -= 1
+                self._statements.pop(id(conn), None)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(database="users.db", **options):
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = ConnectionPool(database, **options)
+            return pool
+        for name, value in options.items():
+            if getattr(pool, name) != value:
+                raise ValueError(f"The pool for {database} already uses "
+                                 f"{name}={getattr(pool, name)!r}, not {value!r}")
+        return pool
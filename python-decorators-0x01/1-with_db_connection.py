@@ -1,5 +1,10 @@
 import sqlite3 
 import functools
+import asyncio
+import inspect
+import queue
+import threading
+import time
 
 def with_db_connection(func):
     @functools.wraps(func)
@@ -12,7 +17,167 @@ def with_db_connection(func):
         return result
     return wrapper
 
-@with_db_connection 
+class ConnectionPool:
+    # Hands out warm connections to users.db. Shared mode keeps at most
+    # max_size connections for all threads; per_thread mode keeps one per
+    # thread and opens a spare only if that thread's connection is busy.
+    def __init__(self, database='users.db', max_size=5, per_thread=False):
+        self.database = database
+        self.max_size = max_size
+        self.per_thread = per_thread
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self.hits = 0
+        self.misses = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _open(self):
+        return sqlite3.connect(self.database, check_same_thread=False)
+
+    def _record(self, hit, waited):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def _acquire_per_thread(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and not self._local.in_use:
+            self._local.in_use = True
+            self._record(True, 0.0)
+            return conn
+        conn = self._open()
+        if getattr(self._local, 'conn', None) is None:
+            self._local.conn = conn
+            self._local.in_use = True
+        self._record(False, 0.0)
+        return conn
+
+    def _open_slot(self, started):
+        # Opens a connection for a slot already counted in _opened
+        try:
+            conn = self._open()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+        self._record(False, time.perf_counter() - started)
+        return conn
+
+    def _acquire_nowait(self, started):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                open_new = self._opened < self.max_size
+                if open_new:
+                    self._opened += 1
+            return self._open_slot(started) if open_new else None
+        return self._take(conn, started)
+
+    def _take(self, conn, started):
+        if conn is None:
+            # The slot of a connection release() threw away
+            return self._open_slot(started)
+        self._record(True, time.perf_counter() - started)
+        return conn
+
+    def acquire(self, timeout=None):
+        if self.per_thread:
+            return self._acquire_per_thread()
+        started = time.perf_counter()
+        conn = self._acquire_nowait(started)
+        if conn is not None:
+            return conn
+        try:
+            conn = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No connection to {self.database} available after {timeout}s")
+        return self._take(conn, started)
+
+    async def acquire_async(self, timeout=None):
+        # Waits by polling on the event loop rather than blocking a worker
+        # thread, so a cancelled caller never leaves behind a thread that
+        # later checks out a connection nobody will release
+        if self.per_thread:
+            return self._acquire_per_thread()
+        started = time.perf_counter()
+        delay = 0.001
+        while True:
+            conn = self._acquire_nowait(started)
+            if conn is not None:
+                return conn
+            if timeout is not None and time.perf_counter() - started >= timeout:
+                raise TimeoutError(f"No connection to {self.database} available after {timeout}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release(self, conn):
+        # A connection the function closed or broke cannot be rolled back;
+        # throw it away and queue its slot as None for the next acquire()
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            if not self.per_thread:
+                self._idle.put(None)
+            elif conn is getattr(self._local, 'conn', None):
+                self._local.conn = None
+                self._local.in_use = False
+            return
+        if self.per_thread:
+            if conn is getattr(self._local, 'conn', None):
+                self._local.in_use = False
+            else:
+                conn.close()
+            return
+        self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            checkouts = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / checkouts if checkouts else 0.0,
+                'avg_wait': self.total_wait / checkouts if checkouts else 0.0,
+                'max_wait': self.max_wait,
+            }
+
+default_pool = ConnectionPool()
+
+def with_pooled_connection(func=None, *, pool=None):
+    if func is None:
+        return functools.partial(with_pooled_connection, pool=pool)
+    pool = pool or default_pool
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            conn = await pool.acquire_async()
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                pool.release(conn)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = pool.acquire()
+        try:
+            return func(conn, *args, **kwargs)
+        finally:
+            pool.release(conn)
+    return wrapper
+
+@with_pooled_connection 
 def get_user_by_id(conn, user_id): 
     cursor = conn.cursor() 
     cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,)) 
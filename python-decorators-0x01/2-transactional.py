@@ -1,5 +1,6 @@
 import sqlite3 
 import functools
+from query_cache import invalidate_tables, table_written
 
 def with_db_connection(func):
     @functools.wraps(func)
@@ -12,12 +13,57 @@ def with_db_connection(func):
         return result
     return wrapper
 
+class WriteTracker:
+    # Wraps a connection (or a cursor) and records the tables its statements
+    # write, leaving the caller's own trace callback alone
+    def __init__(self, target, written):
+        self._target = target
+        self._written = written
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _track(self, sql):
+        for statement in sql.split(';'):
+            table = table_written(statement)
+            if table:
+                self._written.add(table)
+
+    def cursor(self, *args, **kwargs):
+        return WriteTracker(self._target.cursor(*args, **kwargs), self._written)
+
+    def execute(self, sql, *args):
+        self._track(sql)
+        return WriteTracker(self._target.execute(sql, *args), self._written)
+
+    def executemany(self, sql, *args):
+        self._track(sql)
+        return WriteTracker(self._target.executemany(sql, *args), self._written)
+
+    def executescript(self, sql):
+        self._track(sql)
+        return WriteTracker(self._target.executescript(sql), self._written)
+
+    def __iter__(self):
+        return iter(self._target)
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._target.__exit__(*exc)
+
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        # Record the tables each statement writes so cached reads of them
+        # are dropped once the transaction commits
+        written = set()
         try:
-            result = func(conn, *args, **kwargs)
+            result = func(WriteTracker(conn, written), *args, **kwargs)
             conn.commit()
+            invalidate_tables(written)
             return result
         except Exception as e:
             conn.rollback()
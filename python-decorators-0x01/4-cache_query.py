@@ -1,7 +1,6 @@
 import sqlite3 
 import functools
-
-query_cache = {}
+from query_cache import get_backend, single_flight, tables_read
 
 def with_db_connection(func):
     @functools.wraps(func)
@@ -14,24 +13,47 @@ def with_db_connection(func):
         return result
     return wrapper
 
-def cache_query(func):
+def freeze_params(params):
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+def cache_query(func=None, *, ttl=None):
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl)
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
-        query = kwargs.get('query') or (args[1] if len(args) > 1 else '')
-        if query in query_cache:
+        query = kwargs.get('query') or (args[0] if args else '')
+        params = kwargs.get('params', args[1] if len(args) > 1 else ())
+        key = (query, freeze_params(params))
+        tables = tables_read(query)
+        if tables is None:
+            # Reads something a write could not be traced to; never cached
+            return func(conn, *args, **kwargs)
+        backend = get_backend()
+        hit, result = backend.get(key, tables)
+        if hit:
             print("Using cached result for query.")
-            return query_cache[query]
-        else:
-            result = func(conn, *args, **kwargs)
-            query_cache[query] = result
             return result
+        # Single flight: concurrent misses on the same key wait for one query
+        with single_flight(key), backend.flight(key):
+            hit, result = backend.get(key, tables, count=False)
+            if hit:
+                return result
+            # Versions taken before the query, so set() skips the result if
+            # a write to one of its tables committed while it ran
+            versions = backend.versions(tables)
+            result = func(conn, *args, **kwargs)
+            backend.set(key, result, tables, ttl, versions)
+        return result
     return wrapper
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 # First call will cache the result
@@ -0,0 +1,290 @@
+import fcntl
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from query_cache import dumps, key_digest, loads
+
+class MmapCache:
+    # Direct-mapped cache in a memory-mapped file shared by all local
+    # workers. Each table has a generation counter in the header that is
+    # mixed into the entry keys, so bumping it invalidates every cached read
+    # of that table at once; orphaned entries are simply overwritten.
+    MAGIC = b'QCACHE01'
+    GENERATIONS = 256
+    HEADER = struct.Struct(f'=8sII{GENERATIONS}Q')
+    SLOT = struct.Struct('=16sdI4x')
+
+    def __init__(self, path, slots=4096, slot_size=4096, ttl=300):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self.size = self.HEADER.size + slots * slot_size
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # Workers forked after import must not share the parent's file
+        # descriptor, or their flock calls would not exclude each other
+        if self._pid == os.getpid():
+            return
+        # Only a new, empty file is initialised: other processes may have an
+        # existing one mapped, and shrinking it under them raises SIGBUS
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                os.pwrite(fd, self.HEADER.pack(self.MAGIC, self.slots, self.slot_size,
+                                               *([0] * self.GENERATIONS)), 0)
+                os.ftruncate(fd, self.size)
+            else:
+                header = os.pread(fd, 16, 0)
+                if len(header) < 16 or header[:8] != self.MAGIC:
+                    raise ValueError(f"{self.path} is not a query cache file")
+                slots, slot_size = struct.unpack('=II', header[8:])
+                if (slots, slot_size) != (self.slots, self.slot_size) or size != self.size:
+                    raise ValueError(
+                        f"{self.path} was created with slots={slots}, slot_size={slot_size}; "
+                        f"use those or a different path")
+        except BaseException:
+            os.close(fd)
+            raise
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, mode):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _generation_offset(self, table):
+        return 16 + (zlib.crc32(table.encode()) % self.GENERATIONS) * 8
+
+    def _generations(self, tables):
+        return tuple(
+            struct.unpack_from('=Q', self._map, self._generation_offset(table))[0]
+            for table in sorted(tables))
+
+    def _slot(self, key, generations):
+        digest = key_digest((key, generations))
+        index = int.from_bytes(digest[:8], 'little') % self.slots
+        return digest, self.HEADER.size + index * self.slot_size
+
+    def get(self, key, tables=(), count=True):
+        with self._locked(fcntl.LOCK_SH):
+            digest, offset = self._slot(key, self._generations(tables))
+            stored, expires, length = self.SLOT.unpack_from(self._map, offset)
+            if stored != digest or expires <= time.time():
+                return False, None
+            start = offset + self.SLOT.size
+            data = self._map[start:start + length]
+        try:
+            return True, loads(data)
+        except ValueError:
+            return False, None
+
+    def versions(self, tables):
+        with self._locked(fcntl.LOCK_SH):
+            return self._generations(tables)
+
+    def set(self, key, value, tables=(), ttl=None, versions=None):
+        data = dumps(value)
+        if len(data) > self.slot_size - self.SLOT.size:
+            return
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._locked(fcntl.LOCK_EX):
+            generations = self._generations(tables)
+            # A table was written while the query ran, so the result is stale
+            if versions is not None and versions != generations:
+                return
+            digest, offset = self._slot(key, generations)
+            self.SLOT.pack_into(self._map, offset, digest, expires, len(data))
+            start = offset + self.SLOT.size
+            self._map[start:start + len(data)] = data
+
+    def invalidate_tables(self, tables):
+        with self._locked(fcntl.LOCK_EX):
+            for table in tables:
+                offset = self._generation_offset(table.lower())
+                generation = struct.unpack_from('=Q', self._map, offset)[0]
+                struct.pack_into('=Q', self._map, offset, generation + 1)
+
+    @contextmanager
+    def flight(self, key):
+        # A record lock on the key's slot makes other processes wait while
+        # this one fills it (threads are already serialised by SingleFlight)
+        with self._lock:
+            self._open()
+        _, offset = self._slot(key, ())
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+class RespError(Exception):
+    pass
+
+class RespClient:
+    # Just enough of the Redis protocol (RESP2) for the cache: encodes
+    # commands as arrays of bulk strings and parses the reply types
+    def __init__(self, host='127.0.0.1', port=6379, db=0, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._sock = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._file = self._sock.makefile('rb')
+        self._pid = os.getpid()
+        if self.db:
+            self._send([('SELECT', self.db)])
+            self._read()
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = None
+
+    def _send(self, commands):
+        out = bytearray()
+        for command in commands:
+            out += b'*%d\r\n' % len(command)
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode()
+                out += b'$%d\r\n%s\r\n' % (len(arg), arg)
+        self._sock.sendall(out)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def pipeline(self, *commands):
+        # Sends every command in one write and reads the replies in order;
+        # retries once on a fresh connection if the old one went away
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None or self._pid != os.getpid():
+                        self._connect()
+                    self._send(commands)
+                    return [self._read() for _ in commands]
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+    def command(self, *args):
+        return self.pipeline(args)[0]
+
+class RedisCache:
+    # Entries live under prefix + digest with a server-side expiry. Each table
+    # has a version counter that is part of the digest, so a write makes the
+    # old entries unreachable (and a result read before it is stored where
+    # nobody looks); a set of entry keys per table lets them be deleted too.
+    def __init__(self, host='127.0.0.1', port=6379, db=0, ttl=300, prefix='qc:', lock_timeout=10.0):
+        self.client = RespClient(host, port, db)
+        self.ttl = ttl
+        self.prefix = prefix.encode()
+        self.lock_timeout = lock_timeout
+
+    def _key(self, key, versions=()):
+        return self.prefix + key_digest((key, versions)).hex().encode()
+
+    def _table_key(self, table):
+        return self.prefix + b't:' + table.lower().encode()
+
+    def _version_key(self, table):
+        return self.prefix + b'v:' + table.lower().encode()
+
+    def versions(self, tables):
+        if not tables:
+            return ()
+        counts = self.client.command('MGET', *(self._version_key(t) for t in sorted(tables)))
+        return tuple(int(count or 0) for count in counts)
+
+    def get(self, key, tables=(), count=True):
+        data = self.client.command('GET', self._key(key, self.versions(tables)))
+        if data is None:
+            return False, None
+        try:
+            return True, loads(data)
+        except ValueError:
+            return False, None
+
+    def set(self, key, value, tables=(), ttl=None, versions=None):
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        if versions is None:
+            versions = self.versions(tables)
+        entry = self._key(key, versions)
+        commands = [('SET', entry, dumps(value), 'PX', ttl_ms)]
+        for table in tables:
+            commands.append(('SADD', self._table_key(table), entry))
+            commands.append(('PEXPIRE', self._table_key(table), ttl_ms))
+        self.client.pipeline(*commands)
+
+    def invalidate_tables(self, tables):
+        for table in tables:
+            self.client.command('INCR', self._version_key(table))
+            table_key = self._table_key(table)
+            entries = self.client.command('SMEMBERS', table_key) or []
+            self.client.command('DEL', table_key, *entries)
+
+    @contextmanager
+    def flight(self, key):
+        # SET NX lock so one worker on any host runs the query; the others
+        # wait until the lock is freed (then find the value on their re-check)
+        # or lock_timeout passes
+        lock = self._key(key) + b':lock'
+        token = os.urandom(8).hex()
+        deadline = time.monotonic() + self.lock_timeout
+        acquired = False
+        while True:
+            acquired = self.client.command(
+                'SET', lock, token, 'NX', 'PX', int(self.lock_timeout * 1000)) is not None
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if acquired and self.client.command('GET', lock) == token.encode():
+                self.client.command('DEL', lock)
@@ -0,0 +1,276 @@
+import base64
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from urllib.parse import parse_qs, urlparse
+
+# A table name, optionally quoted and schema-qualified ("main"."users");
+# only the last part is captured so main.users and users match
+TABLE_NAME = r'(?:["`\[]?\w+["`\]]?\s*\.\s*)?["`\[]?(\w+)'
+WRITE_TABLE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+    r'\s+' + TABLE_NAME,
+    re.IGNORECASE,
+)
+
+# Strings and comments are skipped; quoted identifiers lose their quotes
+SQL_TOKEN = re.compile(r"""
+    '(?:[^']|'')*' | --[^\n]* | /\*.*?\*/
+    | "((?:[^"]|"")*)" | `([^`]*)` | \[([^\]]*)\] | (\w+) | ([(),.])
+""", re.VERBOSE | re.DOTALL)
+FROM_CLAUSE_END = {'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT', 'WINDOW',
+                   'UNION', 'EXCEPT', 'INTERSECT', 'RETURNING'}
+
+def tables_read(sql):
+    # Every table named in a FROM or JOIN, including comma-separated lists
+    # and derived tables. None when a table reference is not a plain name
+    # (a table-valued function, say): its result must not be cached, since
+    # no write would invalidate it.
+    tokens = [('punct' if match.lastindex == 5 else 'name', match.group(match.lastindex))
+              for match in SQL_TOKEN.finditer(sql) if match.lastindex]
+    tables = set()
+    depth = 0
+    in_from = set()
+    expect_table = False
+    i = 0
+    while i < len(tokens):
+        kind, value = tokens[i]
+        word = value.upper()
+        if expect_table:
+            expect_table = False
+            if value == '(':
+                depth += 1
+            elif kind != 'name':
+                return None
+            else:
+                if tokens[i + 1:i + 2] == [('punct', '.')] and tokens[i + 2:i + 3] \
+                        and tokens[i + 2][0] == 'name':
+                    i += 2
+                    value = tokens[i][1]
+                if tokens[i + 1:i + 2] == [('punct', '(')]:
+                    return None
+                tables.add(value.lower())
+        elif value == '(':
+            depth += 1
+        elif value == ')':
+            in_from.discard(depth)
+            depth -= 1
+        elif kind == 'name' and word in ('FROM', 'JOIN'):
+            in_from.add(depth)
+            expect_table = True
+        elif kind == 'name' and word in FROM_CLAUSE_END:
+            in_from.discard(depth)
+        elif value == ',' and depth in in_from:
+            expect_table = True
+        i += 1
+    if expect_table:
+        return None
+    return tables
+
+def table_written(sql):
+    match = WRITE_TABLE.match(sql)
+    return match.group(1).lower() if match else None
+
+COMPRESS_OVER = 1024
+
+def _pack(value):
+    # Rows as plain JSON; tuples, bytes and dicts are tagged objects so they
+    # come back as the same types
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_pack(item) for item in value]
+    if isinstance(value, tuple):
+        return {'t': [_pack(item) for item in value]}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'b': base64.b64encode(value).decode()}
+    if isinstance(value, dict):
+        return {'d': [[_pack(k), _pack(v)] for k, v in value.items()]}
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+def _unpack(value):
+    if isinstance(value, list):
+        return [_unpack(item) for item in value]
+    if isinstance(value, dict):
+        if 't' in value:
+            return tuple(_unpack(item) for item in value['t'])
+        if 'b' in value:
+            return base64.b64decode(value['b'])
+        return {_unpack(k): _unpack(v) for k, v in value['d']}
+    return value
+
+def dumps(value):
+    # Data only (never pickle: these bytes come back from other processes or
+    # over the network), zlib-compressed when that pays off; the first byte
+    # says which
+    data = json.dumps(_pack(value), separators=(',', ':')).encode()
+    if len(data) > COMPRESS_OVER:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data):
+            return b'z' + packed
+    return b'j' + data
+
+def loads(data):
+    try:
+        if data[:1] == b'z':
+            data = b'j' + zlib.decompress(data[1:])
+        if data[:1] != b'j':
+            raise ValueError("Unknown cache entry format")
+        return _unpack(json.loads(data[1:]))
+    except (zlib.error, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupt cache entry: {e}") from None
+
+def key_digest(key):
+    return hashlib.blake2b(pickle.dumps(key, pickle.HIGHEST_PROTOCOL), digest_size=16).digest()
+
+class SingleFlight:
+    # One lock per key, so threads missing on the same key wait for the one
+    # that runs the query instead of all running it
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key):
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+class QueryCache:
+    # LRU cache of query results with a per-entry TTL, an entry limit and a
+    # byte budget (sized by the pickled result). Entries are indexed by the
+    # tables their query reads so writes can drop them, and each table has a
+    # version so a result read before a write is not stored after it.
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, tables=(), count=True):
+        # count=False for a re-check of a key whose miss was already counted
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += count
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += count
+            return True, entry[0]
+
+    def versions(self, tables):
+        # Taken before running the query and handed back to set()
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in sorted(tables))
+
+    def set(self, key, value, tables=(), ttl=None, versions=None):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if versions is not None and versions != tuple(
+                    self._versions.get(table, 0) for table in sorted(tables)):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, size, frozenset(tables))
+            self.bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size, tables = self._entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                table = table.lower()
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+
+    def flight(self, key):
+        return nullcontext()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+def backend_from_url(url):
+    # memory://?max_entries=..&ttl=..    this process only
+    # mmap:///path/to/file?slots=..      shared by every process on the host
+    # redis://host:port/db?ttl=..        shared through a Redis-protocol server
+    parsed = urlparse(url)
+    options = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+    options = {name: float(value) if '.' in value else int(value) for name, value in options.items()}
+    if parsed.scheme in ('', 'memory'):
+        return QueryCache(**options)
+    from cache_backends import MmapCache, RedisCache
+    if parsed.scheme == 'mmap':
+        return MmapCache(parsed.path, **options)
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.strip('/') or 0)
+        return RedisCache(parsed.hostname or '127.0.0.1', parsed.port or 6379, db, **options)
+    raise ValueError(f"Unknown query cache backend: {url}")
+
+_backend = backend_from_url(os.environ.get('QUERY_CACHE_URL', 'memory://'))
+single_flight = SingleFlight()
+
+def get_backend():
+    return _backend
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+def invalidate_tables(tables):
+    _backend.invalidate_tables(tables)
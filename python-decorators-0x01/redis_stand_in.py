@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+import socketserver
+import sys
+import threading
+import time
+
+class Store:
+    # In-memory data for the commands RedisCache sends: strings with an
+    # optional expiry, sets, and integer counters
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def run(self, command, args):
+        with self.lock:
+            handler = getattr(self, 'cmd_' + command.decode().lower(), None)
+            if handler is None:
+                return RespHandler.Error(f"ERR unknown command '{command.decode()}'")
+            return handler(*args)
+
+    def cmd_ping(self):
+        return RespHandler.Status('PONG')
+
+    def cmd_select(self, db):
+        return RespHandler.Status('OK')
+
+    def cmd_get(self, key):
+        return self.values[key] if self._live(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._live(key):
+            return None
+        self.values[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            self.cmd_pexpire(key, options[options.index(b'PX') + 1])
+        return RespHandler.Status('OK')
+
+    def cmd_incr(self, key):
+        value = int(self.values[key]) + 1 if self._live(key) else 1
+        self.values[key] = str(value).encode()
+        return value
+
+    def cmd_exists(self, *keys):
+        return sum(self._live(key) for key in keys)
+
+    def cmd_del(self, *keys):
+        removed = sum(self._live(key) for key in keys)
+        for key in keys:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def cmd_sadd(self, key, *members):
+        if not self._live(key):
+            self.values[key] = set()
+        members_set = self.values[key]
+        added = len(set(members) - members_set)
+        members_set.update(members)
+        return added
+
+    def cmd_smembers(self, key):
+        return sorted(self.values[key]) if self._live(key) else []
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self._live(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
+
+class RespHandler(socketserver.StreamRequestHandler):
+    # One client connection: reads RESP arrays of bulk strings and writes
+    # back the reply for each command in order
+    class Status(str):
+        pass
+
+    class Error(str):
+        pass
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            try:
+                reply = self.server.store.run(args[0], args[1:])
+            except (TypeError, ValueError) as e:
+                reply = self.Error(f"ERR {e}")
+            self.wfile.write(self.encode(reply))
+
+    def encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, self.Status):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, self.Error):
+            return b'-%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(self.encode(item) for item in reply)
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    # Tiny Redis-protocol server covering what RedisCache uses, for tests
+    # and local runs without a real Redis:  python3 redis_stand_in.py [port]
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), RespHandler)
+        self.store = Store()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == '__main__':
+    server = RedisStandIn(port=int(sys.argv[1]) if len(sys.argv) > 1 else 6379)
+    print(f"Listening on 127.0.0.1:{server.port}")
+    server.serve_forever()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for query_cache.py and the shared backends in cache_backends.py
+"""
+
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from cache_backends import MmapCache, RedisCache
+from query_cache import QueryCache, dumps, loads, tables_read
+from redis_stand_in import RedisStandIn
+
+ROWS = [(1, 'Alice', 'alice@example.com', 30), (2, 'Bob', None, 41.5)]
+
+
+class TestSerialization(unittest.TestCase):
+    """Tests for the data-only dumps/loads used between processes."""
+
+    def test_round_trip(self):
+        """Rows, bytes and dicts come back as the same types."""
+        value = [(1, 'x', None, 2.5, True, b'\x00\xff'), {'a': (1,)}] * 200
+        self.assertEqual(loads(dumps(value)), value)
+        self.assertEqual(dumps(value)[:1], b'z')
+
+    def test_refuses_pickle(self):
+        """A pickled payload is rejected instead of being unpickled."""
+        payload = b'p' + pickle.dumps(ROWS)
+        with self.assertRaises(ValueError):
+            loads(payload)
+
+    def test_refuses_objects(self):
+        """Values that are not plain data cannot be cached."""
+        with self.assertRaises(TypeError):
+            dumps([object()])
+
+
+class TestTablesRead(unittest.TestCase):
+    """Tests for the tables a cached read is indexed under."""
+
+    def test_table_lists(self):
+        """Comma lists, joins, qualified names and subqueries are all found."""
+        cases = [
+            ("SELECT * FROM main.users", {'users'}),
+            ("SELECT * FROM users u, orders AS o WHERE u.id = o.uid", {'users', 'orders'}),
+            ("SELECT * FROM a JOIN b ON a.id = b.id, c", {'a', 'b', 'c'}),
+            ("SELECT * FROM (SELECT * FROM users) x, orders", {'users', 'orders'}),
+            ("SELECT 'FROM x, y' FROM users WHERE id IN (1, 2)", {'users'}),
+        ]
+        for sql, tables in cases:
+            self.assertEqual(tables_read(sql), tables, sql)
+
+    def test_unparsed_reads(self):
+        """Reads from anything but plain tables are reported as None."""
+        self.assertIsNone(tables_read("SELECT * FROM json_each(?)"))
+
+
+class TestQueryCache(unittest.TestCase):
+    """Tests for the in-process QueryCache."""
+
+    def test_recheck_not_counted(self):
+        """The re-check under the flight lock does not count a second miss."""
+        cache = QueryCache()
+        cache.get('q', {'users'})
+        cache.get('q', {'users'}, count=False)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+class TestRedisCache(unittest.TestCase):
+    """Tests for RedisCache against the Redis-protocol stand-in."""
+
+    def setUp(self):
+        """Start a fresh server for each test."""
+        self.server = RedisStandIn().start()
+        self.cache = RedisCache(port=self.server.port)
+
+    def tearDown(self):
+        """Close the client and stop the server."""
+        self.cache.client.close()
+        self.server.stop()
+
+    def test_get_set(self):
+        """A stored result is returned for the same key only."""
+        self.assertEqual(self.cache.get('q', {'users'}), (False, None))
+        self.cache.set('q', ROWS, {'users'})
+        self.assertEqual(self.cache.get('q', {'users'}), (True, ROWS))
+        self.assertEqual(self.cache.get('other', {'users'}), (False, None))
+
+    def test_ttl(self):
+        """Entries expire after their TTL."""
+        self.cache.set('q', ROWS, {'users'}, ttl=0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get('q', {'users'}), (False, None))
+
+    def test_invalidate_tables(self):
+        """Writing a table drops the results that read it."""
+        self.cache.set('q', ROWS, {'users'})
+        self.cache.set('p', ROWS, {'posts'})
+        self.cache.invalidate_tables(['USERS'])
+        self.assertEqual(self.cache.get('q', {'users'}), (False, None))
+        self.assertEqual(self.cache.get('p', {'posts'}), (True, ROWS))
+
+    def test_stale_set_skipped(self):
+        """A result read before an invalidation is never returned after it."""
+        versions = self.cache.versions({'users'})
+        self.cache.invalidate_tables(['users'])
+        self.cache.set('q', ROWS, {'users'}, versions=versions)
+        self.assertEqual(self.cache.get('q', {'users'}), (False, None))
+
+    def test_flight(self):
+        """A second worker waits until the first has filled the entry."""
+        other = RedisCache(port=self.server.port)
+        self.addCleanup(other.client.close)
+        entered = threading.Event()
+        results = []
+
+        def fill():
+            with self.cache.flight('q'):
+                entered.set()
+                time.sleep(0.2)
+                self.cache.set('q', ROWS, {'users'})
+
+        worker = threading.Thread(target=fill)
+        worker.start()
+        entered.wait()
+        with other.flight('q'):
+            results.append(other.get('q', {'users'}))
+        worker.join()
+        self.assertEqual(results, [(True, ROWS)])
+
+
+def _mmap_fill(path, event):
+    """Fill an entry from another process while holding its flight lock."""
+    cache = MmapCache(path, slots=64, slot_size=1024)
+    with cache.flight('q'):
+        event.set()
+        time.sleep(0.2)
+        cache.set('q', ROWS, {'users'})
+
+
+def _mmap_invalidate(path):
+    """Invalidate the users table from another process."""
+    MmapCache(path, slots=64, slot_size=1024).invalidate_tables(['users'])
+
+
+class TestMmapCache(unittest.TestCase):
+    """Tests for MmapCache shared between processes."""
+
+    def setUp(self):
+        """Use a fresh cache file for each test."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.bin')
+        self.cache = MmapCache(self.path, slots=64, slot_size=1024)
+        self.context = multiprocessing.get_context('spawn')
+
+    def test_shared_between_processes(self):
+        """Another process fills the entry while this one waits on its flight."""
+        event = self.context.Event()
+        child = self.context.Process(target=_mmap_fill, args=(self.path, event))
+        child.start()
+        self.assertTrue(event.wait(10))
+        with self.cache.flight('q'):
+            result = self.cache.get('q', {'users'})
+        child.join()
+        self.assertEqual(result, (True, ROWS))
+
+    def test_invalidated_by_other_process(self):
+        """An invalidation in another process drops this process's entry."""
+        self.cache.set('q', ROWS, {'users'})
+        child = self.context.Process(target=_mmap_invalidate, args=(self.path,))
+        child.start()
+        child.join()
+        self.assertEqual(self.cache.get('q', {'users'}), (False, None))
+
+    def test_stale_set_skipped(self):
+        """A result read before an invalidation is not stored."""
+        versions = self.cache.versions({'users'})
+        self.cache.invalidate_tables(['users'])
+        self.cache.set('q', ROWS, {'users'}, versions=versions)
+        self.assertEqual(self.cache.get('q', {'users'}), (False, None))
+
+    def test_geometry_mismatch(self):
+        """Opening an existing file with other sizes raises and leaves it alone."""
+        self.cache.set('q', ROWS, {'users'})
+        size = os.path.getsize(self.path)
+        with self.assertRaises(ValueError):
+            MmapCache(self.path, slots=128, slot_size=1024).get('q')
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(self.cache.get('q', {'users'}), (True, ROWS))
+
+
+if __name__ == '__main__':
+    unittest.main()
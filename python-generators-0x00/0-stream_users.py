@@ -1,10 +1,16 @@
-from seed import connect_to_prodev
+from pool import pooled_cursor
 
 def stream_users():
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
-    for row in cursor:
-        yield row
-    cursor.close()
-    connection.close()
\ No newline at end of file
+    with pooled_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM user_data")
+        for row in cursor:
+            yield row
+
+def stream_users_unbuffered(prefetch=1000, as_dict=False):
+    with pooled_cursor(buffered=False, dictionary=as_dict) as cursor:
+        cursor.execute("SELECT user_id, name, email, age FROM user_data")
+        while True:
+            rows = cursor.fetchmany(prefetch)
+            if not rows:
+                break
+            yield from rows
@@ -1,22 +1,53 @@
-from seed import connect_to_prodev
+from pool import pooled_cursor
+from seed import USER_COLUMNS
+
+FILTER_OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
 
 def stream_users_in_batches(batch_size):
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
-    batch = []
-    for row in cursor:
-        batch.append(row)
-        if len(batch) == batch_size:
+    with pooled_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM user_data")
+        batch = []
+        for row in cursor:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def build_where(filters):
+    # filters is a sequence of (column, operator, value); names and operators
+    # are checked against known ones, values are bound as parameters
+    clauses = []
+    params = []
+    for column, operator, value in filters:
+        if column not in USER_COLUMNS:
+            raise ValueError(f"Unknown user_data column: {column}")
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator}")
+        clauses.append(f"{column} {operator} %s")
+        params.append(value)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, tuple(params)
+
+def stream_filtered_batches(batch_size, filters=()):
+    # The server applies the filter and rows arrive through an unbuffered
+    # cursor one batch at a time; closing the generator early releases the
+    # cursor and returns the connection to the pool straight away
+    where, params = build_where(filters)
+    with pooled_cursor(buffered=False, dictionary=True) as cursor:
+        cursor.execute(f"SELECT * FROM user_data{where}", params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
             yield batch
-            batch = []
-    if batch:
-        yield batch
-    cursor.close()
-    connection.close()
 
 def batch_processing(batch_size):
-    for batch in stream_users_in_batches(batch_size):
-        for user in batch:
-            if user['age'] > 25:
-                return user
\ No newline at end of file
+    batches = stream_filtered_batches(batch_size, [('age', '>', 25)])
+    try:
+        for batch in batches:
+            for user in batch:
+                yield user
+    finally:
+        batches.close()
@@ -1,18 +1,50 @@
-from seed import connect_to_prodev
+import base64
+from pool import pooled_connection
+from seed import execute_prepared, fetch_dicts
 
-def paginate_users(page_size, offset):
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+PAGE_QUERY = "SELECT * FROM user_data LIMIT %s OFFSET %s"
+FIRST_KEYSET_QUERY = "SELECT * FROM user_data ORDER BY user_id LIMIT %s"
+NEXT_KEYSET_QUERY = "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s"
+
+def paginate_users(page_size, offset, connection=None):
+    if connection is None:
+        with pooled_connection() as connection:
+            return paginate_users(page_size, offset, connection)
+    cursor = execute_prepared(connection, PAGE_QUERY, (page_size, offset))
+    return fetch_dicts(cursor)
 
 def lazy_pagination(page_size):
     offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
\ No newline at end of file
+    with pooled_connection() as connection:
+        while True:
+            page = paginate_users(page_size, offset, connection)
+            if not page:
+                break
+            yield page
+            offset += page_size
+
+
+def encode_cursor(last_seen):
+    return base64.urlsafe_b64encode(str(last_seen).encode()).decode()
+
+def decode_cursor(token):
+    if not token:
+        return None
+    return base64.urlsafe_b64decode(token.encode()).decode()
+
+def keyset_pagination(page_size, cursor_token=None):
+    # Seeks past the last user_id seen instead of skipping OFFSET rows, so
+    # every page costs the same. Yields (page, token); pass the token back as
+    # cursor_token to resume after that page.
+    last_seen = decode_cursor(cursor_token)
+    with pooled_connection() as connection:
+        while True:
+            if last_seen is None:
+                cursor = execute_prepared(connection, FIRST_KEYSET_QUERY, (page_size,))
+            else:
+                cursor = execute_prepared(connection, NEXT_KEYSET_QUERY, (last_seen, page_size))
+            page = fetch_dicts(cursor)
+            if not page:
+                break
+            last_seen = page[-1]['user_id']
+            yield page, encode_cursor(last_seen)
@@ -1,19 +1,215 @@
-from seed import connect_to_prodev
+import math
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from mysql.connector.pooling import CNX_POOL_MAXSIZE
+from pool import ConnectionPool, pooled_cursor
+from seed import USER_COLUMNS
+
+SQL_AGGREGATES = {
+    'avg': 'AVG(age)',
+    'sum': 'SUM(age)',
+    'count': 'COUNT(age)',
+    'min': 'MIN(age)',
+    'max': 'MAX(age)',
+}
 
 def stream_user_ages():
-    connection = connect_to_prodev()
-    cursor = connection.cursor()
-    cursor.execute("SELECT age FROM user_data")
-    for (age,) in cursor:
-        yield age
-    cursor.close()
-    connection.close()
-
-def calculate_average_age():
-    total_age = 0
-    count = 0
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
-    average = total_age / count if count else 0
+    with pooled_cursor() as cursor:
+        cursor.execute("SELECT age FROM user_data")
+        for (age,) in cursor:
+            yield age
+
+def calculate_average_age(pushdown=False):
+    if pushdown:
+        average = aggregate_ages(('avg',))['avg'] or 0
+    else:
+        total_age = 0
+        count = 0
+        for age in stream_user_ages():
+            total_age += age
+            count += 1
+        average = total_age / count if count else 0
     print(f"Average age of users: {average}")
+
+def check_column(column):
+    # Column names cannot be bound as parameters, so only known ones are allowed
+    if column not in USER_COLUMNS:
+        raise ValueError(f"Unknown user_data column: {column}")
+    return column
+
+def run_query(query, params=()):
+    with pooled_cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.column_names, cursor.fetchall()
+
+def aggregate_ages(aggregates=('avg', 'sum', 'count'), percentiles=(), group_by=None):
+    # Computed by the server; only one row per group crosses the wire.
+    # Percentiles use the nearest-rank method over CUME_DIST() (MySQL 8+).
+    key = check_column(group_by) if group_by else None
+    select = [f"{SQL_AGGREGATES[name]} AS {name}" for name in aggregates]
+    select += [f"MIN(CASE WHEN dist >= %s THEN age END) AS pct{index}"
+               for index in range(len(percentiles))]
+    source = "user_data"
+    if percentiles:
+        partition = f"PARTITION BY {key} " if key else ""
+        columns = f"{key}, " if key else ""
+        source = (f"(SELECT {columns}age, CUME_DIST() OVER ({partition}ORDER BY age) AS dist "
+                  f"FROM user_data) ranked")
+    query = f"SELECT {key + ', ' if key else ''}{', '.join(select)} FROM {source}"
+    if key:
+        query += f" GROUP BY {key}"
+
+    names = list(aggregates) + [f"p{percentile * 100:g}" for percentile in percentiles]
+    _, rows = run_query(query, tuple(percentiles))
+    if not key:
+        return dict(zip(names, rows[0])) if rows else {}
+    return {row[0]: dict(zip(names, row[1:])) for row in rows}
+
+def age_histogram(bucket_width=10, group_by=None):
+    key = check_column(group_by) if group_by else None
+    columns = f"{key}, " if key else ""
+    query = (f"SELECT {columns}FLOOR(age / %s) * %s AS bucket, COUNT(*) FROM user_data "
+             f"GROUP BY {columns}bucket ORDER BY {columns}bucket")
+    _, rows = run_query(query, (bucket_width, bucket_width))
+    if not key:
+        return {bucket: count for bucket, count in rows}
+    histogram = {}
+    for group, bucket, count in rows:
+        histogram.setdefault(group, {})[bucket] = count
+    return histogram
+
+def fold_ages(chunk_size=10000, group_by=None):
+    # Client-side fallback: folds each fetchmany block into typed arrays and
+    # sums them in one pass instead of accumulating row by row
+    key = check_column(group_by) if group_by else None
+    totals = {}
+    with pooled_cursor() as cursor:
+        cursor.execute(f"SELECT {key + ', ' if key else ''}age FROM user_data")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks = {}
+            for row in rows:
+                chunks.setdefault(row[0] if key else None, array('d')).append(row[-1])
+            for group, values in chunks.items():
+                total = totals.setdefault(group, [0.0, 0, float('inf'), float('-inf')])
+                total[0] += sum(values)
+                total[1] += len(values)
+                total[2] = min(total[2], min(values))
+                total[3] = max(total[3], max(values))
+
+    results = {
+        group: {'avg': total / count, 'sum': total, 'count': count, 'min': low, 'max': high}
+        for group, (total, count, low, high) in totals.items()
+    }
+    if not key:
+        return results.get(None, {'avg': 0, 'sum': 0, 'count': 0, 'min': None, 'max': None})
+    return results
+
+
+class AgeSummary:
+    # Partial aggregate for one partition: exact sum/count/min/max plus a
+    # bucketed count sketch for quantiles. Buckets are `resolution` wide
+    # (whole years by default, which is exact for DECIMAL ages), and merging
+    # two sketches just adds their bucket counts.
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+        self.total = 0.0
+        self.count = 0
+        self.low = math.inf
+        self.high = -math.inf
+        self.buckets = {}
+
+    def add_chunk(self, values):
+        if not values:
+            return
+        self.total += sum(values)
+        self.count += len(values)
+        self.low = min(self.low, min(values))
+        self.high = max(self.high, max(values))
+        for value in values:
+            bucket = math.floor(value / self.resolution)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge sketches with different resolutions")
+        self.total += other.total
+        self.count += other.count
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return bucket * self.resolution
+        return self.high
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0
+
+
+def partition_bounds(partitions):
+    # user_id values are UUID strings, so evenly spaced hex prefixes split the
+    # key space into ranges of roughly equal size. The outer ranges are open
+    # so ids outside the hex alphabet are still covered.
+    cuts = [f"{index * 16 ** 8 // partitions:08x}" for index in range(1, partitions)]
+    return list(zip([None] + cuts, cuts + [None]))
+
+def scan_partition(low, high, chunk_size=10000, resolution=1.0, pool=None):
+    clauses = []
+    params = []
+    if low is not None:
+        clauses.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        clauses.append("user_id < %s")
+        params.append(high)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    summary = AgeSummary(resolution)
+    cursor_context = pool.cursor(buffered=False) if pool else pooled_cursor(buffered=False)
+    with cursor_context as cursor:
+        cursor.execute(f"SELECT age FROM user_data{where}", tuple(params))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            summary.add_chunk(array('d', (age for (age,) in rows)))
+    return summary
+
+def partitioned_age_summary(partitions=16, use_processes=False, chunk_size=10000, resolution=1.0):
+    # Threads share a pool sized for this scan, so every range gets its own
+    # connection. Processes are spawned rather than forked so none of them
+    # inherits the parent's pooled sockets; each opens its own default pool.
+    summary = AgeSummary(resolution)
+    bounds = partition_bounds(partitions)
+    if use_processes:
+        with ProcessPoolExecutor(max_workers=partitions,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(scan_partition, low, high, chunk_size, resolution)
+                       for low, high in bounds]
+            for future in futures:
+                summary.merge(future.result())
+        return summary
+
+    scan_pool = ConnectionPool(min(partitions, CNX_POOL_MAXSIZE), name="age_scan_pool")
+    try:
+        with ThreadPoolExecutor(max_workers=partitions) as executor:
+            futures = [executor.submit(scan_partition, low, high, chunk_size, resolution, scan_pool)
+                       for low, high in bounds]
+            for future in futures:
+                summary.merge(future.result())
+    finally:
+        scan_pool.close()
+    return summary
@@ -0,0 +1,108 @@
+import asyncio
+from contextlib import suppress
+
+import aiomysql
+from seed import PRODEV_CONFIG
+
+DEFAULT_POOL_SIZE = 10
+PAGE_QUERY = "SELECT * FROM user_data LIMIT %s OFFSET %s"
+
+_END = object()
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool(size=DEFAULT_POOL_SIZE):
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            config = dict(PRODEV_CONFIG)
+            config['db'] = config.pop('database')
+            # autocommit so a finished SELECT leaves no open transaction;
+            # otherwise Pool.release closes the connection instead of reusing it
+            _pool = await aiomysql.create_pool(minsize=1, maxsize=size, autocommit=True, **config)
+        return _pool
+
+async def close_async_pool():
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            await _pool.wait_closed()
+            _pool = None
+
+
+async def _produce(queue, query, params, chunk_size, cursor_class):
+    pool = await get_async_pool()
+    connection = await pool.acquire()
+    finished = False
+    try:
+        cursor = await connection.cursor(cursor_class)
+        await cursor.execute(query, params)
+        while True:
+            rows = await cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # Blocks while the consumer is max_chunks behind
+            await queue.put(rows)
+        await cursor.close()
+        finished = True
+        await queue.put(_END)
+    except Exception as err:
+        await queue.put(err)
+    finally:
+        # A stream that was cancelled or failed mid-way still has rows on the
+        # wire; close the socket so the pool discards it rather than draining
+        if finished:
+            pool.release(connection)
+        else:
+            connection.close()
+            pool.release(connection)
+            # Pool.release only wakes acquire() waiters for connections it
+            # keeps; wake one so it opens a replacement for the closed one
+            async with pool._cond:
+                pool._cond.notify()
+
+async def stream_chunks(query, params=(), chunk_size=1000, max_chunks=4, as_dict=True):
+    cursor_class = aiomysql.SSDictCursor if as_dict else aiomysql.SSCursor
+    queue = asyncio.Queue(maxsize=max_chunks)
+    producer = asyncio.ensure_future(_produce(queue, query, params, chunk_size, cursor_class))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
+
+
+async def async_stream_users(chunk_size=1000, max_chunks=4):
+    async for rows in stream_chunks("SELECT * FROM user_data", (), chunk_size, max_chunks):
+        for row in rows:
+            yield row
+
+async def async_stream_users_in_batches(batch_size, max_chunks=4):
+    async for batch in stream_chunks("SELECT * FROM user_data", (), batch_size, max_chunks):
+        yield list(batch)
+
+async def async_paginate_users(connection, page_size, offset):
+    async with connection.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(PAGE_QUERY, (page_size, offset))
+        return list(await cursor.fetchall())
+
+async def async_lazy_pagination(page_size):
+    pool = await get_async_pool()
+    async with pool.acquire() as connection:
+        offset = 0
+        while True:
+            page = await async_paginate_users(connection, page_size, offset)
+            if not page:
+                break
+            yield page
+            offset += page_size
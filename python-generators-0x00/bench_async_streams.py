@@ -0,0 +1,26 @@
+import asyncio
+import sys
+import time
+
+from async_streams import async_stream_users, close_async_pool
+
+async def count_rows():
+    rows = 0
+    async for _ in async_stream_users():
+        rows += 1
+    return rows
+
+async def run(streams):
+    started = time.perf_counter()
+    counts = await asyncio.gather(*(count_rows() for _ in range(streams)))
+    return sum(counts), time.perf_counter() - started
+
+async def main(levels):
+    print(f"{'streams':>8} {'rows':>12} {'seconds':>9} {'rows/sec':>12}")
+    for streams in levels:
+        rows, elapsed = await run(streams)
+        print(f"{streams:>8} {rows:>12} {elapsed:>9.2f} {rows / elapsed if elapsed else 0:>12.0f}")
+    await close_async_pool()
+
+if __name__ == '__main__':
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8]))
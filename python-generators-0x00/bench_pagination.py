@@ -0,0 +1,28 @@
+import sys
+import time
+
+lazy_paginate = __import__('2-lazy_paginate')
+
+def time_export(pages, row_count):
+    started = time.perf_counter()
+    rows = 0
+    for page in pages:
+        rows += len(page)
+        if rows >= row_count:
+            break
+    pages.close()
+    return rows, time.perf_counter() - started
+
+def keyset_pages(page_size):
+    for page, _ in lazy_paginate.keyset_pagination(page_size):
+        yield page
+
+if __name__ == '__main__':
+    page_size = 1000
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 50_000, 100_000, 500_000]
+    print(f"{'rows':>10} {'offset s':>10} {'keyset s':>10} {'speedup':>8}")
+    for size in sizes:
+        rows, offset_time = time_export(lazy_paginate.lazy_pagination(page_size), size)
+        _, keyset_time = time_export(keyset_pages(page_size), size)
+        speedup = offset_time / keyset_time if keyset_time else 0
+        print(f"{rows:>10} {offset_time:>10.2f} {keyset_time:>10.2f} {speedup:>7.1f}x")
@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+
+stream_users_unbuffered = __import__('0-stream_users').stream_users_unbuffered
+
+def current_rss_kb():
+    with open('/proc/self/statm') as file:
+        pages = int(file.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+def measure(row_count, prefetch=1000, sample_every=10000):
+    start_rss = peak_rss = current_rss_kb()
+    started = time.perf_counter()
+    rows = 0
+    stream = stream_users_unbuffered(prefetch=prefetch)
+    for rows, _ in enumerate(stream, 1):
+        if rows % sample_every == 0:
+            peak_rss = max(peak_rss, current_rss_kb())
+        if rows == row_count:
+            break
+    stream.close()
+    return rows, time.perf_counter() - started, start_rss, peak_rss
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000, 10_000_000]
+    for size in sizes:
+        rows, elapsed, start_rss, peak_rss = measure(size)
+        print(f"{rows:>10} rows  {elapsed:8.2f}s  rss start {start_rss} KB  peak {peak_rss} KB  "
+              f"growth {peak_rss - start_rss} KB")
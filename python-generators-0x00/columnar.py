@@ -0,0 +1,154 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from seed import USER_COLUMNS
+
+# File layout: MAGIC, then one chunk per input batch. A chunk is
+#   CHUNK_HEADER (marker, row count)
+#   per text column: uint64 offsets[rows + 1], utf-8 data padded to 8 bytes
+#   age: float64[rows]
+# Every section is native byte order and 8-byte aligned, so the reader can
+# cast slices of the mapped file straight into typed memoryviews.
+MAGIC = b'UCOL1' + (b'L' if sys.byteorder == 'little' else b'B') + b'\0\0'
+CHUNK_HEADER = struct.Struct('=4sxxxxQ')
+CHUNK_MARKER = b'CHNK'
+TEXT_COLUMNS = ('user_id', 'name', 'email')
+
+
+def to_column_chunks(batches):
+    # Accepts batches of dict rows or tuples in USER_COLUMNS order
+    for batch in batches:
+        if not batch:
+            continue
+        if isinstance(batch[0], dict):
+            batch = [tuple(row[column] for column in USER_COLUMNS) for row in batch]
+        columns = {}
+        for index, column in enumerate(USER_COLUMNS):
+            values = [row[index] for row in batch]
+            if column == 'age':
+                columns[column] = array('d', values)
+            else:
+                columns[column] = [str(value) for value in values]
+        yield len(batch), columns
+
+
+def pad(size):
+    return -size % 8
+
+
+def write_chunk(file, rows, columns):
+    file.write(CHUNK_HEADER.pack(CHUNK_MARKER, rows))
+    for column in TEXT_COLUMNS:
+        encoded = [value.encode('utf-8') for value in columns[column]]
+        offsets = array('Q', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        file.write(offsets.tobytes())
+        file.write(b''.join(encoded))
+        file.write(b'\0' * pad(offsets[-1]))
+    file.write(columns['age'].tobytes())
+
+
+def write_columnar(path, batches):
+    # Only one batch is held in memory at a time
+    rows = 0
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        for chunk_rows, columns in to_column_chunks(batches):
+            write_chunk(file, chunk_rows, columns)
+            rows += chunk_rows
+    return rows
+
+
+class TextColumn:
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+
+class ColumnChunk:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def row(self, index):
+        return tuple(self.columns[column][index] for column in USER_COLUMNS)
+
+
+class ColumnarReader:
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if bytes(self._view[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar user_data file for this platform")
+        self.chunks = list(self._index_chunks())
+
+    def _index_chunks(self):
+        # Only chunk headers and offset tails are read; column data stays mapped
+        position = len(MAGIC)
+        while position < len(self._view):
+            marker, rows = CHUNK_HEADER.unpack_from(self._view, position)
+            if marker != CHUNK_MARKER:
+                raise ValueError(f"Corrupt chunk at byte {position}")
+            position += CHUNK_HEADER.size
+            columns = {}
+            for column in TEXT_COLUMNS:
+                offsets_size = (rows + 1) * 8
+                offsets = self._view[position:position + offsets_size].cast('Q')
+                position += offsets_size
+                data_size = offsets[rows]
+                columns[column] = TextColumn(offsets, self._view[position:position + data_size])
+                position += data_size + pad(data_size)
+            columns['age'] = self._view[position:position + rows * 8].cast('d')
+            position += rows * 8
+            yield ColumnChunk(rows, columns)
+
+    def __len__(self):
+        return sum(chunk.rows for chunk in self.chunks)
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            for index in range(chunk.rows):
+                yield chunk.row(index)
+
+    def column(self, name):
+        for chunk in self.chunks:
+            yield chunk[name]
+
+    def close(self):
+        # Views into the map must be released before it can be closed
+        for chunk in getattr(self, 'chunks', ()):
+            for column in chunk.columns.values():
+                if isinstance(column, TextColumn):
+                    column.offsets.release()
+                    column.data.release()
+                else:
+                    column.release()
+        self.chunks = []
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
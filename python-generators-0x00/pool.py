@@ -0,0 +1,134 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import pooling
+from schema import check_query_plans
+from seed import PRODEV_CONFIG, release_prepared
+
+DEFAULT_POOL_SIZE = 5
+
+
+class ConnectionPool:
+    def __init__(self, size=DEFAULT_POOL_SIZE, name="prodev_pool", **config):
+        self.size = size
+        # Sessions are not reset on return so prepared statements cached by
+        # seed.prepared_cursor stay valid across checkouts; release() rolls
+        # back instead so no transaction outlives a checkout
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name=name,
+            pool_size=size,
+            pool_reset_session=False,
+            **(config or PRODEV_CONFIG)
+        )
+        # MySQLConnectionPool fails at once when exhausted; the semaphore
+        # makes callers wait for a free connection instead
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, timeout=None):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No connection available after {timeout}s")
+        try:
+            # get_connection() reconnects connections that were dropped
+            connection = self._pool.get_connection()
+        except Exception:
+            self._slots.release()
+            raise
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return connection
+
+    def release(self, connection):
+        try:
+            # Rows left unread by an abandoned stream would block the next
+            # user; drop the socket and let the next checkout reconnect
+            if connection.unread_result:
+                self._drop(connection)
+            else:
+                try:
+                    # Ends the snapshot the SELECT opened (autocommit is off),
+                    # so the next checkout sees fresh rows and DDL from other
+                    # connections is not blocked by its metadata locks
+                    connection.rollback()
+                except mysql.connector.Error:
+                    self._drop(connection)
+            connection.close()
+        except mysql.connector.Error:
+            pass
+        finally:
+            self._slots.release()
+
+    def _drop(self, connection):
+        # Prepared statements die with the session, so forget them before
+        # the connection is reconnected under the same physical object
+        release_prepared(connection)
+        try:
+            connection.disconnect()
+        except mysql.connector.Error:
+            pass
+        with self._lock:
+            self.dropped += 1
+
+    @contextmanager
+    def connection(self, timeout=None):
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    @contextmanager
+    def cursor(self, timeout=None, **cursor_options):
+        with self.connection(timeout) as connection:
+            cursor = connection.cursor(**cursor_options)
+            try:
+                yield cursor
+            finally:
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    pass
+
+    def close(self):
+        # Closes the idle connections; call once every checkout is released
+        self._pool._remove_connections()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'checkouts': self.checkouts,
+                'dropped': self.dropped,
+                'avg_wait': self.total_wait / self.checkouts if self.checkouts else 0.0,
+                'max_wait': self.max_wait,
+            }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_pool(size=DEFAULT_POOL_SIZE):
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            new_pool = ConnectionPool(size)
+            with new_pool.connection() as connection:
+                check_query_plans(connection)
+            _default_pool = new_pool
+        return _default_pool
+
+def pooled_connection(timeout=None):
+    return get_pool().connection(timeout)
+
+def pooled_cursor(timeout=None, **cursor_options):
+    return get_pool().cursor(timeout, **cursor_options)
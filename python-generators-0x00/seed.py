@@ -1,6 +1,23 @@
 import mysql.connector
 import csv
+import os
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 from mysql.connector import errorcode
+from schema import ensure_indexes
+
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+PRODEV_CONFIG = {
+    'host': "localhost",
+    'user': "root",
+    'password': "your_password",
+    'database': "ALX_prodev",
+}
+
+# Prepared cursors per physical connection, keyed by query text
+prepared_statements = weakref.WeakKeyDictionary()
 
 def connect_db():
     try:
@@ -23,18 +40,44 @@ def create_database(connection):
     finally:
         cursor.close()
 
-def connect_to_prodev():
+def connect_to_prodev(**options):
     try:
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="your_password",
-            database="ALX_prodev"
-        )
+        return mysql.connector.connect(**PRODEV_CONFIG, **options)
     except mysql.connector.Error as err:
         print(err)
         return None
 
+def physical_connection(connection):
+    # Pooled connections are new wrappers on every checkout around the same
+    # underlying connection
+    return getattr(connection, '_cnx', None) or connection
+
+def prepared_cursor(connection, query):
+    # The server parses each query once per connection; later executions of
+    # the same text only send the bound parameters
+    statements = prepared_statements.setdefault(physical_connection(connection), {})
+    cursor = statements.get(query)
+    if cursor is None:
+        cursor = connection.cursor(prepared=True)
+        statements[query] = cursor
+    return cursor
+
+def execute_prepared(connection, query, params=()):
+    cursor = prepared_cursor(connection, query)
+    cursor.execute(query, params)
+    return cursor
+
+def fetch_dicts(cursor, size=None):
+    rows = cursor.fetchall() if size is None else cursor.fetchmany(size)
+    return [dict(zip(cursor.column_names, row)) for row in rows]
+
+def release_prepared(connection):
+    for cursor in prepared_statements.pop(physical_connection(connection), {}).values():
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            pass
+
 def create_table(connection):
     cursor = connection.cursor()
     cursor.execute('''
@@ -43,11 +86,14 @@ def create_table(connection):
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
             age DECIMAL NOT NULL,
-            INDEX(user_id)
+            updated_at TIMESTAMP(6) NOT NULL
+                DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
         )
     ''')
     connection.commit()
     cursor.close()
+    # Secondary indexes come from schema.USER_DATA_INDEXES
+    ensure_indexes(connection)
     print("Table user_data created successfully")
 
 def insert_data(connection, csv_file):
@@ -60,4 +106,181 @@ def insert_data(connection, csv_file):
                 VALUES (%s, %s, %s, %s)
             """, (row['user_id'], row['name'], row['email'], row['age']))
     connection.commit()
-    cursor.close()
\ No newline at end of file
+    cursor.close()
+
+def read_csv_chunks(csv_file, chunk_size, skip=0):
+    with open(csv_file, 'r', newline='') as file:
+        reader = csv.DictReader(file)
+        chunk = []
+        for index, row in enumerate(reader):
+            if index < skip:
+                continue
+            chunk.append(tuple(row[column] for column in USER_COLUMNS))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def insert_chunk(cursor, chunk):
+    # One multi-row INSERT per chunk instead of one round trip per row
+    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+    cursor.execute(
+        "INSERT IGNORE INTO user_data (user_id, name, email, age) VALUES " + placeholders,
+        [value for row in chunk for value in row]
+    )
+
+def read_checkpoint(checkpoint_file):
+    try:
+        with open(checkpoint_file, 'r') as file:
+            return int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def write_checkpoint(checkpoint_file, rows_done):
+    # Write then rename so a crash never leaves a half written checkpoint
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w') as file:
+        file.write(str(rows_done))
+    os.replace(tmp_file, checkpoint_file)
+
+def local_infile_enabled(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SHOW VARIABLES LIKE 'local_infile'")
+        row = cursor.fetchone()
+        return bool(row) and str(row[1]).upper() in ('ON', '1')
+    except mysql.connector.Error:
+        return False
+    finally:
+        cursor.close()
+
+def load_data_infile(connection, csv_file, skip=0):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            IGNORE {1 + int(skip)} LINES
+            (user_id, name, email, age)
+        """, (os.path.abspath(csv_file),))
+        connection.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def bulk_insert_data(connection, csv_file, chunk_size=5000, use_load_data=False,
+                     checkpoint_file=None):
+    # Commits every chunk and records progress in checkpoint_file so a crashed
+    # run picks up after the last committed chunk. LOAD DATA needs the
+    # connection opened with connect_to_prodev(allow_local_infile=True).
+    if checkpoint_file is None:
+        checkpoint_file = csv_file + '.checkpoint'
+    rows_done = read_checkpoint(checkpoint_file)
+    if rows_done:
+        print(f"Resuming after {rows_done} committed rows")
+    start = time.perf_counter()
+    rows_sent = 0
+
+    if use_load_data and local_infile_enabled(connection):
+        try:
+            rows_sent = load_data_infile(connection, csv_file, skip=rows_done)
+        except mysql.connector.Error as err:
+            connection.rollback()
+            print(f"LOAD DATA failed, falling back to batched inserts: {err}")
+            use_load_data = False
+    else:
+        use_load_data = False
+
+    if not use_load_data:
+        cursor = connection.cursor()
+        try:
+            for chunk in read_csv_chunks(csv_file, chunk_size, skip=rows_done):
+                insert_chunk(cursor, chunk)
+                connection.commit()
+                rows_done += len(chunk)
+                rows_sent += len(chunk)
+                write_checkpoint(checkpoint_file, rows_done)
+        finally:
+            cursor.close()
+
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    elapsed = time.perf_counter() - start
+    rate = rows_sent / elapsed if elapsed else 0
+    print(f"Inserted {rows_sent} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return rows_sent
+
+def shard_csv(csv_file, workers):
+    # Split the data lines into byte ranges that start and end on line breaks
+    size = os.path.getsize(csv_file)
+    with open(csv_file, 'rb') as file:
+        file.readline()
+        bounds = [file.tell()]
+        step = max((size - bounds[0]) // workers, 1)
+        for shard in range(1, workers):
+            file.seek(max(bounds[0] + shard * step, bounds[-1]))
+            file.readline()
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+def read_shard_chunks(csv_file, start, end, chunk_size):
+    with open(csv_file, 'rb') as file:
+        header = next(csv.reader([file.readline().decode('utf-8')]))
+        indexes = [header.index(column) for column in USER_COLUMNS]
+        file.seek(start)
+        chunk = []
+        while file.tell() < end:
+            line = file.readline()
+            if not line:
+                break
+            values = next(csv.reader([line.decode('utf-8')]), None)
+            if not values:
+                continue
+            chunk.append(tuple(values[index] for index in indexes))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def insert_shard(worker_id, csv_file, start, end, chunk_size):
+    connection = connect_to_prodev()
+    if connection is None:
+        raise RuntimeError(f"Worker {worker_id} could not connect to ALX_prodev")
+    cursor = connection.cursor()
+    started = time.perf_counter()
+    rows = 0
+    try:
+        for chunk in read_shard_chunks(csv_file, start, end, chunk_size):
+            insert_chunk(cursor, chunk)
+            connection.commit()
+            rows += len(chunk)
+    finally:
+        cursor.close()
+        connection.close()
+    return worker_id, rows, time.perf_counter() - started
+
+def parallel_insert_data(csv_file, workers=None, chunk_size=5000):
+    # Each worker process opens its own connection and seeds one byte range
+    workers = workers or os.cpu_count() or 1
+    shards = shard_csv(csv_file, workers)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shards) or 1) as pool:
+        futures = [
+            pool.submit(insert_shard, worker_id, csv_file, start, end, chunk_size)
+            for worker_id, (start, end) in enumerate(shards)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    total = 0
+    for worker_id, rows, worker_elapsed in results:
+        rate = rows / worker_elapsed if worker_elapsed else 0
+        print(f"Worker {worker_id}: {rows} rows in {worker_elapsed:.2f}s ({rate:.0f} rows/sec)")
+        total += rows
+    rate = total / elapsed if elapsed else 0
+    print(f"Inserted {total} rows with {len(results)} workers in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return results
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled producers in async_streams.py
+"""
+
+import asyncio
+import unittest
+from contextlib import aclosing
+from unittest.mock import patch
+import aiomysql
+import async_streams
+
+
+class FakeReader:
+    """Stream reader state the pool inspects on free connections."""
+    eof_received = False
+
+    def at_eof(self):
+        return False
+
+    def exception(self):
+        return None
+
+
+class FakeCursor:
+    """Unbuffered cursor over a fixed number of rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, query, params=()):
+        pass
+
+    async def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    async def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connection holding 100 rows; counts how many are open."""
+    opened = 0
+
+    def __init__(self):
+        self._reader = FakeReader()
+        self.closed = False
+        self.last_usage = 0
+        FakeConnection.opened += 1
+
+    async def cursor(self, cursor_class):
+        return FakeCursor([{'user_id': n} for n in range(100)])
+
+    def get_transaction_status(self):
+        return False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            FakeConnection.opened -= 1
+
+    async def ensure_closed(self):
+        self.close()
+
+
+async def fake_connect(**kwargs):
+    return FakeConnection()
+
+
+class TestStreamChunks(unittest.IsolatedAsyncioTestCase):
+    """Tests for stream_chunks on a small pool."""
+
+    async def asyncSetUp(self):
+        """Use a two-connection pool of fake connections."""
+        patcher = patch('aiomysql.pool.connect', fake_connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        async_streams._pool_lock = asyncio.Lock()
+        async_streams._pool = await aiomysql.create_pool(minsize=1, maxsize=2)
+        self.addAsyncCleanup(async_streams.close_async_pool)
+
+    async def take(self, count):
+        """Read count rows from a stream, then stop it."""
+        rows = []
+        async with aclosing(async_streams.async_stream_users(chunk_size=1)) as stream:
+            async for row in stream:
+                rows.append(row)
+                if len(rows) == count:
+                    break
+        return rows
+
+    async def test_early_exit_frees_pool(self):
+        """More streams than connections, each stopped early, all finish."""
+        results = await asyncio.wait_for(
+            asyncio.gather(*(self.take(5) for _ in range(6))), 5)
+        self.assertEqual([len(rows) for rows in results], [5] * 6)
+        self.assertLessEqual(FakeConnection.opened, 2)
+
+    async def test_full_read_reuses_connections(self):
+        """Streams read to the end hand their connection back for reuse."""
+        results = await asyncio.wait_for(
+            asyncio.gather(*(self.take(1000) for _ in range(4))), 5)
+        self.assertEqual([len(rows) for rows in results], [100] * 4)
+        self.assertEqual(async_streams._pool.freesize, async_streams._pool.size)
+
+
+if __name__ == '__main__':
+    unittest.main()